@@ -1,25 +1,52 @@
 import random
 import datetime
-from typing import Union, List, Dict
+import functools
+from typing import Union, List, Dict, Iterator
 import os
 import subprocess
-import platform
 import argparse
 import time
 import logging
+import logging.handlers
+import queue
+import atexit
 import shutil
+import ctypes
+import ctypes.util
 from pathlib import Path
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+logger = logging.getLogger(__name__)
+
+def _setup_logging() -> None:
+    """
+    配置日志，文件和控制台输出由后台线程完成，避免阻塞轮询
+    重复调用时不再添加处理器
+    """
+    if logger.handlers:
+        return
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
         logging.FileHandler('nfc_write.log'),
         logging.StreamHandler()
     ]
-)
-logger = logging.getLogger(__name__)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+# 固定块数据，导入时解码一次
+_SECTOR0_B0 = bytes.fromhex('11EEE82A3D080400047AC493FC85B798')
+_SECTOR0_B3 = bytes.fromhex('702A2630344B07878F692857385F6829')
+_SECTOR1_B0 = bytes.fromhex('1644FCA83EDE58D64683C53899F40AE4')
+_KEY_BLOCK = bytes.fromhex('D10560C1F76AC151BF0732E6760052A4')
+_SECTOR1_B3 = bytes.fromhex('702A2630344B61E789692857385F6829')
+_SECTOR2_B3_TRAIL = bytes.fromhex('702A2630344B34B78C692857385F6829')
+_TRAILER = bytes.fromhex('FFFFFFFFFFFFFF078069FFFFFFFFFFFF')
 
 def generate_sector2_block3(date: str = None, suffix: str = None) -> str:
     """
@@ -28,20 +55,45 @@ def generate_sector2_block3(date: str = None, suffix: str = None) -> str:
     :param suffix: 尾号，如果为None则随机生成
     :return: 32字符的十六进制字符串
     """
+    return _sector2_block3_bytes(date, suffix).hex().upper()
+
+def _sector2_block3_bytes(date: str = None, suffix: str = None) -> bytes:
+    """
+    生成扇区2块3的原始数据
+    :param date: 日期字符串，如果为None则使用当天日期
+    :param suffix: 尾号，如果为None则随机生成
+    :return: 编码后的字节数据
+    """
     if date is None:
         date = datetime.datetime.now().strftime('%Y%m%d')
     if suffix is None:
         suffix = generate_random_suffix()
     
-    str_data = f"{date}BB{suffix}"
-    return ''.join([hex(ord(c))[2:].zfill(2).upper() for c in str_data])
+    return _sector2_block3_cached(date, suffix)
+
+@functools.lru_cache(maxsize=128)
+def _sector2_block3_cached(date: str, suffix: str) -> bytes:
+    """
+    按(日期, 尾号)缓存扇区2块3的编码结果，批量写入相同数据时直接复用
+    校验同样只在首次计算时执行
+    :param date: 8位日期字符串
+    :param suffix: 6位尾号
+    :return: 编码后的16字节数据
+    """
+    if len(date) != 8 or len(suffix) != 6:
+        raise ValueError('Date must be 8 chars (YYYYMMDD) and suffix must be 6 chars')
+    return f"{date}BB{suffix}".encode('ascii')
 
 def generate_random_suffix() -> str:
     """
     生成6位随机数字
     :return: 6位数字字符串
     """
-    return str(random.randint(100000, 999999))
+    # 单次20位随机数覆盖900000个取值，超出范围时重新抽取以避免取模偏差
+    while True:
+        n = random.getrandbits(20)
+        if n < 900000:
+            return str(100000 + n)
 
 def generate_random_hex(bytes_length: int) -> str:
     """
@@ -49,8 +101,7 @@ def generate_random_hex(bytes_length: int) -> str:
     :param bytes_length: 字节数
     :return: 十六进制字符串
     """
-    return ''.join([hex(random.randint(0, 255))[2:].zfill(2).upper() 
-                   for _ in range(bytes_length)])
+    return os.urandom(bytes_length).hex().upper()
 
 def generate_random_block_data() -> str:
     """
@@ -59,6 +110,13 @@ def generate_random_block_data() -> str:
     """
     return generate_random_hex(16)
 
+def _random_block_bytes() -> bytes:
+    """
+    生成随机的16字节原始数据，供内部直接写入缓冲区
+    :return: 16字节数据
+    """
+    return os.urandom(16)
+
 def write_hex_to_pos(buffer: bytearray, hex_str: str, position: int) -> None:
     """
     将十六进制字符串写入指定位置
@@ -66,107 +124,255 @@ def write_hex_to_pos(buffer: bytearray, hex_str: str, position: int) -> None:
     :param hex_str: 十六进制字符串
     :param position: 写入位置
     """
-    if len(hex_str) != 32:
+    data = bytes.fromhex(hex_str)
+    if len(data) != 16:
         raise ValueError('Hex string must be 32 chars (16 bytes)')
-    for i in range(16):
-        byte = int(hex_str[i*2:i*2+2], 16)
-        buffer[position + i] = byte
+    buffer[position:position + 16] = data
+
+def _build_mfd_template() -> bytes:
+    """
+    构建MFD模板，所有固定块已写好，可变块留空
+    :return: 1024字节的模板数据
+    """
+    buffer = bytearray(1024)
+    
+    # 扇区0 (块1、块2为可变块)
+    buffer[0:16] = _SECTOR0_B0  # 块0
+    buffer[48:64] = _SECTOR0_B3  # 块3
+    
+    # 扇区1
+    buffer[64:80] = _SECTOR1_B0  # 块0
+    buffer[80:96] = _KEY_BLOCK  # 块1
+    buffer[96:112] = _KEY_BLOCK  # 块2
+    buffer[112:128] = _SECTOR1_B3  # 块3
+    
+    # 扇区2 (块2为可变块)
+    buffer[128:144] = _KEY_BLOCK  # 块0
+    buffer[144:160] = _KEY_BLOCK  # 块1
+    buffer[176:192] = _SECTOR2_B3_TRAIL  # 块3
+    
+    # 扇区3-15 (块0-2填充0，块3为扇区尾部默认密钥)
+    buffer[192:1024] = (bytes(48) + _TRAILER) * 13
+    
+    return bytes(buffer)
+
+_MFD_TEMPLATE = _build_mfd_template()
 
 def generate_binary_mfd(sector0_block1: str = None, 
                        sector0_block2: str = None, 
-                       sector2_block3: str = None) -> bytes:
+                       sector2_block3: str = None) -> bytearray:
     """
     生成MIFARE Classic 1K格式的二进制MFD数据
     :param sector0_block1: 扇区0块1的16字节十六进制字符串
     :param sector0_block2: 扇区0块2的16字节十六进制字符串
     :param sector2_block3: 扇区2块3的16字节十六进制字符串
-    :return: 1024字节的MFD二进制数据
+    :return: 1024字节的MFD二进制数据 (直接返回缓冲区，不再复制为bytes)
     """
-    # 创建1024字节的缓冲区
-    buffer = bytearray(1024)
+    # 从模板复制，只需写入可变块
+    buffer = bytearray(_MFD_TEMPLATE)
     
-    # 如果参数为None，生成随机数据
+    # 如果参数为None，直接写入随机字节，无需经过十六进制转换
     if sector0_block1 is None:
-        sector0_block1 = generate_random_block_data()
+        buffer[16:32] = _random_block_bytes()  # 扇区0块1
+    else:
+        write_hex_to_pos(buffer, sector0_block1, 16)
     if sector0_block2 is None:
-        sector0_block2 = generate_random_block_data()
+        buffer[32:48] = _random_block_bytes()  # 扇区0块2
+    else:
+        write_hex_to_pos(buffer, sector0_block2, 32)
     if sector2_block3 is None:
         sector2_block3 = generate_sector2_block3()
+    write_hex_to_pos(buffer, sector2_block3, 160)  # 扇区2块2
     
-    # 扇区0
-    write_hex_to_pos(buffer, '11EEE82A3D080400047AC493FC85B798', 0)  # 块0
-    write_hex_to_pos(buffer, sector0_block1, 16)  # 块1
-    write_hex_to_pos(buffer, sector0_block2, 32)  # 块2
-    write_hex_to_pos(buffer, '702A2630344B07878F692857385F6829', 48)  # 块3
-    
-    # 扇区1
-    write_hex_to_pos(buffer, '1644FCA83EDE58D64683C53899F40AE4', 64)  # 块0
-    write_hex_to_pos(buffer, 'D10560C1F76AC151BF0732E6760052A4', 80)  # 块1
-    write_hex_to_pos(buffer, 'D10560C1F76AC151BF0732E6760052A4', 96)  # 块2
-    write_hex_to_pos(buffer, '702A2630344B61E789692857385F6829', 112)  # 块3
-    
-    # 扇区2
-    write_hex_to_pos(buffer, 'D10560C1F76AC151BF0732E6760052A4', 128)  # 块0
-    write_hex_to_pos(buffer, 'D10560C1F76AC151BF0732E6760052A4', 144)  # 块1
-    write_hex_to_pos(buffer, sector2_block3, 160)  # 块2
-    write_hex_to_pos(buffer, '702A2630344B34B78C692857385F6829', 176)  # 块3
-    
-    # 扇区3-15 (填充空白数据和默认密钥)
-    for sector in range(3, 16):
-        sector_start = sector * 64
-        # 块0-2填充0
-        for block in range(3):
-            write_hex_to_pos(buffer, '00000000000000000000000000000000', 
-                           sector_start + block*16)
-        # 块3 (扇区尾部)
-        write_hex_to_pos(buffer, 'FFFFFFFFFFFFFF078069FFFFFFFFFFFF', 
-                        sector_start + 48)
-    
-    return bytes(buffer)
+    return buffer
+
+def generate_binary_mfd_batch(count: int, date: str = None, 
+                              suffix: str = None) -> List[bytes]:
+    """
+    批量生成MFD二进制数据，随机数据一次性生成
+    :param count: 生成数量
+    :param date: 日期字符串，如果为None则使用当天日期
+    :param suffix: 尾号，如果为None则每张随机生成
+    :return: MFD二进制数据列表，每张标签一份独立数据
+    """
+    return [bytes(buffer) for buffer in _iter_binary_mfd(count, date, suffix)]
+
+def _iter_binary_mfd(count: int, date: str = None, 
+                     suffix: str = None) -> Iterator[bytearray]:
+    """
+    批量生成MFD二进制数据，所有标签复用同一个缓冲区
+    随机数据和扇区2块3数据在调用时一次性生成并校验
+    :param count: 生成数量
+    :param date: 日期字符串，如果为None则使用当天日期
+    :param suffix: 尾号，如果为None则每张随机生成
+    :return: 依次产出缓冲区的迭代器，产出的数据在下次迭代时会被覆盖
+    """
+    # 每张卡需要32字节随机数据 (扇区0块1、块2各16字节)
+    random_data = memoryview(os.urandom(count * 32))
+    sector2_blocks = [_sector2_block3_bytes(date, suffix) for _ in range(count)]
+    return _fill_binary_mfd(bytearray(_MFD_TEMPLATE), random_data, sector2_blocks)
+
+def _fill_binary_mfd(buffer: bytearray, random_data: memoryview, 
+                     sector2_blocks: List[bytes]) -> Iterator[bytearray]:
+    """
+    依次将每张标签的可变块写入缓冲区，三个可变块每次都会被完整覆盖
+    :param buffer: 按模板初始化的1024字节缓冲区
+    :param random_data: 每张32字节的随机数据 (扇区0块1、块2)
+    :param sector2_blocks: 每张16字节的扇区2块2数据
+    :return: 产出缓冲区的迭代器
+    """
+    for i, sector2_block in enumerate(sector2_blocks):
+        buffer[16:48] = random_data[i*32:i*32 + 32]  # 扇区0块1、块2
+        buffer[160:176] = sector2_block  # 扇区2块2
+        yield buffer
 
-def save_mfd_file(data: bytes, filename: str = 'output.mfd') -> None:
+def save_mfd_file(data: Union[bytes, bytearray], filename: str = 'output.mfd') -> None:
     """
     保存MFD文件
     :param data: 二进制数据
     :param filename: 文件名
     """
-    with open(filename, 'wb') as f:
-        f.write(data)
+    # 直接使用文件描述符写入，省去缓冲写入层 (Windows下需要O_BINARY)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(filename, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+# 字节到两位小写十六进制的查找表，用于按nfc-list格式输出UID
+_HEX_LOWER = tuple(f'{i:02x}' for i in range(256))
+
+# nfc-list 输出中UID所在行的标记
+_UID_MARKER = b'UID (NFCID1):'
+_NO_DEVICE_MARKER = b'No NFC device found'
+
+# libnfc 结构体定义 (与nfc-types.h一致，使用#pragma pack(1)紧凑布局)
+_NMT_ISO14443A = 1
+_NBR_106 = 1
+
+class _NfcModulation(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ('nmt', ctypes.c_int),
+        ('nbr', ctypes.c_int),
+    ]
+
+class _NfcIso14443aInfo(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ('abtAtqa', ctypes.c_uint8 * 2),
+        ('btSak', ctypes.c_uint8),
+        ('szUidLen', ctypes.c_size_t),
+        ('abtUid', ctypes.c_uint8 * 10),
+        ('szAtsLen', ctypes.c_size_t),
+        ('abtAts', ctypes.c_uint8 * 254),
+    ]
+
+class _NfcTargetInfo(ctypes.Union):
+    # nfc_iso14443a_info 是 nfc_target_info 中最大的成员 (283字节)，
+    # 只声明该成员即可得到与libnfc一致的联合体大小
+    _pack_ = 1
+    _fields_ = [
+        ('nai', _NfcIso14443aInfo),
+    ]
+
+class _NfcTarget(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ('nti', _NfcTargetInfo),
+        ('nm', _NfcModulation),
+    ]
 
 class NFCController:
-    def __init__(self):
-        self.system = platform.system().lower()
+    def __init__(self, use_libnfc: bool = False):
+        """
+        :param use_libnfc: 是否通过libnfc动态库轮询标签UID (实验性)，默认使用nfc-list命令
+        """
         self.nfc_list_cmd = 'nfc-list'
         self.nfc_mfclassic_cmd = 'nfc-mfclassic'
         self.processed_uids: List[str] = []  # 用于存储已处理的标签UID
         self.temp_dir = Path('temp_mfd_files')
         self.generated_files: List[Path] = []  # 用于跟踪生成的文件
+        self.libnfc = None
+        self.nfc_context = ctypes.c_void_p()
+        if use_libnfc:
+            self._init_libnfc()
         self.cleanup_old_files()
         self.temp_dir.mkdir(exist_ok=True)
 
+    def _init_libnfc(self):
+        """
+        加载libnfc动态库，用于直接读取标签UID，避免每次轮询都启动nfc-list进程
+        加载失败时回退到调用nfc-list命令
+        """
+        lib_name = ctypes.util.find_library('nfc') or 'libnfc.so.6'
+        try:
+            lib = ctypes.CDLL(lib_name)
+            lib.nfc_init.argtypes = [ctypes.POINTER(ctypes.c_void_p)]
+            lib.nfc_init.restype = None
+            lib.nfc_exit.argtypes = [ctypes.c_void_p]
+            lib.nfc_exit.restype = None
+            lib.nfc_open.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+            lib.nfc_open.restype = ctypes.c_void_p
+            lib.nfc_close.argtypes = [ctypes.c_void_p]
+            lib.nfc_close.restype = None
+            lib.nfc_initiator_init.argtypes = [ctypes.c_void_p]
+            lib.nfc_initiator_init.restype = ctypes.c_int
+            lib.nfc_initiator_list_passive_targets.argtypes = [
+                ctypes.c_void_p, _NfcModulation, ctypes.POINTER(_NfcTarget), ctypes.c_size_t
+            ]
+            lib.nfc_initiator_list_passive_targets.restype = ctypes.c_int
+            lib.nfc_init(ctypes.byref(self.nfc_context))
+        except (OSError, AttributeError) as e:
+            logger.info("未能加载libnfc动态库，将使用nfc-list命令: %s", e)
+            return
+        
+        if not self.nfc_context:
+            logger.info("libnfc初始化失败，将使用nfc-list命令")
+            return
+        self.libnfc = lib
+        logger.info("已加载libnfc动态库")
+
+    def close(self):
+        """
+        释放libnfc上下文
+        """
+        if self.libnfc is not None:
+            self.libnfc.nfc_exit(self.nfc_context)
+            self.libnfc = None
+
     def cleanup_old_files(self):
         """
         清理旧文件
         """
-        # 清理临时目录
+        # 清理临时目录中的.mfd文件 (保留目录本身)
         if self.temp_dir.exists():
             try:
-                shutil.rmtree(self.temp_dir)
-                logger.info("已清理旧的临时文件目录")
+                with os.scandir(self.temp_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.mfd') and entry.is_file():
+                            os.unlink(entry.path)
+                logger.info("已清理旧的临时文件")
             except Exception as e:
-                logger.warning(f"清理临时目录时发生错误: {str(e)}")
+                logger.warning("清理临时目录时发生错误: %s", e)
 
         # 清理当前目录下的.mfd文件
         try:
-            for file in Path('.').glob('*.mfd'):
-                if file.name.startswith('tag_') or file.name.startswith('temp_'):
-                    try:
-                        file.unlink()
-                        logger.info(f"已删除旧文件: {file.name}")
-                    except Exception as e:
-                        logger.warning(f"删除文件 {file.name} 时发生错误: {str(e)}")
+            with os.scandir('.') as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith(('tag_', 'temp_')) and name.endswith('.mfd') and entry.is_file():
+                        try:
+                            os.unlink(entry.path)
+                            logger.info("已删除旧文件: %s", name)
+                        except Exception as e:
+                            logger.warning("删除文件 %s 时发生错误: %s", name, e)
         except Exception as e:
-            logger.warning(f"清理旧文件时发生错误: {str(e)}")
+            logger.warning("清理旧文件时发生错误: %s", e)
 
     def cleanup_generated_files(self, keep_files: bool = False):
         """
@@ -178,9 +384,9 @@ class NFCController:
                 try:
                     if file.exists():
                         file.unlink()
-                        logger.info(f"已删除生成的文件: {file.name}")
+                        logger.info("已删除生成的文件: %s", file.name)
                 except Exception as e:
-                    logger.warning(f"删除文件 {file.name} 时发生错误: {str(e)}")
+                    logger.warning("删除文件 %s 时发生错误: %s", file.name, e)
 
     def check_nfc_reader(self) -> bool:
         """
@@ -190,9 +396,7 @@ class NFCController:
         try:
             result = subprocess.run(
                 [self.nfc_list_cmd],
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
+                capture_output=True
             )
             
             if result.returncode != 0:
@@ -200,7 +404,7 @@ class NFCController:
                 return False
                 
             # 检查输出中是否包含NFC设备信息
-            if "No NFC device found" in result.stdout:
+            if _NO_DEVICE_MARKER in result.stdout:
                 logger.error("未检测到NFC设备")
                 return False
                 
@@ -211,7 +415,7 @@ class NFCController:
             logger.error("未找到nfc-list命令，请确保已安装libnfc工具包")
             return False
         except Exception as e:
-            logger.error(f"检测NFC读写器时发生错误: {str(e)}")
+            logger.error("检测NFC读写器时发生错误: %s", e)
             return False
 
     def get_tag_uid(self) -> str:
@@ -219,27 +423,57 @@ class NFCController:
         获取当前标签的UID
         :return: str 标签UID，如果没有标签则返回空字符串
         """
+        if self.libnfc is not None:
+            return self._get_tag_uid_libnfc()
+        
         try:
             result = subprocess.run(
                 [self.nfc_list_cmd],
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
+                capture_output=True
             )
             
             if result.returncode != 0:
                 return ""
                 
-            # 解析输出获取UID
-            for line in result.stdout.split('\n'):
-                if "UID (NFCID1)" in line:
-                    uid = line.split(':')[-1].strip()
-                    return uid
-            return ""
+            # 直接在原始输出中查找UID，无需解码和分行
+            output = result.stdout
+            start = output.find(_UID_MARKER)
+            if start < 0:
+                return ""
+            end = output.find(b'\n', start)
+            if end < 0:
+                end = len(output)
+            return output[start + len(_UID_MARKER):end].strip().decode('ascii')
             
         except Exception as e:
-            logger.error(f"获取标签UID时发生错误: {str(e)}")
+            logger.error("获取标签UID时发生错误: %s", e)
+            return ""
+
+    def _get_tag_uid_libnfc(self) -> str:
+        """
+        通过libnfc直接获取当前标签的UID，格式与nfc-list输出一致
+        设备每次用完即关闭，以免占用读写器导致nfc-mfclassic无法打开
+        :return: str 标签UID，如果没有标签则返回空字符串
+        """
+        lib = self.libnfc
+        device = lib.nfc_open(self.nfc_context, None)
+        if not device:
+            return ""
+        try:
+            if lib.nfc_initiator_init(device) < 0:
+                return ""
+            target = _NfcTarget()
+            modulation = _NfcModulation(_NMT_ISO14443A, _NBR_106)
+            if lib.nfc_initiator_list_passive_targets(device, modulation, ctypes.byref(target), 1) <= 0:
+                return ""
+            info = target.nti.nai
+            uid = bytes(info.abtUid[:info.szUidLen])
+            return '  '.join(map(_HEX_LOWER.__getitem__, uid))
+        except Exception as e:
+            logger.error("获取标签UID时发生错误: %s", e)
             return ""
+        finally:
+            lib.nfc_close(device)
 
     def wait_for_new_tag(self, processed_uids: List[str], poll_interval: float = 0.1) -> str:
         """
@@ -251,9 +485,13 @@ class NFCController:
         logger.info("等待放入新标签...")
         last_uid = ""
         no_tag_count = 0
+        # 轮询循环中使用局部变量，避免重复属性查找
+        get_tag_uid = self.get_tag_uid
+        sleep = time.sleep
+        processed = set(processed_uids)
         
         while True:
-            current_uid = self.get_tag_uid()
+            current_uid = get_tag_uid()
             
             # 如果没有检测到标签
             if not current_uid:
@@ -263,20 +501,20 @@ class NFCController:
                 no_tag_count += 1
                 if no_tag_count % 10 == 0:  # 每10次轮询提示一次
                     logger.info("→ 等待放入新标签...")
-                time.sleep(poll_interval)
+                sleep(poll_interval)
                 continue
             
             # 如果检测到标签
             if current_uid != last_uid:  # 标签发生变化
-                if current_uid in processed_uids:
+                if current_uid in processed:
                     logger.warning("⚠ 检测到已处理的标签，请移除后放入新标签")
                     last_uid = current_uid
                 else:
-                    logger.info(f"✓ 检测到新标签 (UID: {current_uid})")
+                    logger.info("✓ 检测到新标签 (UID: %s)", current_uid)
                     return current_uid
             
             last_uid = current_uid
-            time.sleep(poll_interval)
+            sleep(poll_interval)
 
     def read_tag_to_file(self, filename: str) -> bool:
         """
@@ -293,14 +531,14 @@ class NFCController:
             )
             
             if result.returncode != 0:
-                logger.error(f"读取标签失败: {result.stderr}")
+                logger.error("读取标签失败: %s", result.stderr)
                 return False
                 
-            logger.info(f"标签读取成功，已保存到: {filename}")
+            logger.info("标签读取成功，已保存到: %s", filename)
             return True
             
         except Exception as e:
-            logger.error(f"读取标签时发生错误: {str(e)}")
+            logger.error("读取标签时发生错误: %s", e)
             return False
 
     def write_tag_from_file(self, source_file: str, target_file: str, max_retries: int = 3) -> bool:
@@ -321,16 +559,16 @@ class NFCController:
                 )
                 
                 if "Done" in result.stdout and "blocks written" in result.stdout:
-                    logger.info(f"标签写入成功 (尝试 {attempt + 1}/{max_retries})")
+                    logger.info("标签写入成功 (尝试 %d/%d)", attempt + 1, max_retries)
                     return True
                     
-                logger.warning(f"标签写入可能未完全成功 (尝试 {attempt + 1}/{max_retries})")
+                logger.warning("标签写入可能未完全成功 (尝试 %d/%d)", attempt + 1, max_retries)
                 if attempt < max_retries - 1:
                     logger.info("等待5秒后重试...")
                     time.sleep(5)
                     
             except Exception as e:
-                logger.error(f"写入标签时发生错误 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                logger.error("写入标签时发生错误 (尝试 %d/%d): %s", attempt + 1, max_retries, e)
                 if attempt < max_retries - 1:
                     time.sleep(5)
                     
@@ -353,27 +591,41 @@ def main():
     parser.add_argument('--count', type=int, default=1, help='写入标签数量 (默认: 1)')
     parser.add_argument('--prefix', type=str, default='tag', help='输出文件前缀 (默认: tag)')
     parser.add_argument('--keep-files', action='store_true', help='保留生成的文件 (默认: 不保留)')
+    parser.add_argument('--libnfc', action='store_true', 
+                        help='通过libnfc动态库轮询标签，不再每次启动nfc-list (实验性，默认: 不启用)')
     
     args = parser.parse_args()
+    _setup_logging()
     
     logger.info("="*50)
     logger.info("NFC标签写入程序启动")
-    logger.info(f"配置信息: 写入数量={args.count}, 日期={args.date or '当天'}, 尾号={args.suffix or '随机'}")
+    logger.info("配置信息: 写入数量=%d, 日期=%s, 尾号=%s", args.count, args.date or '当天', args.suffix or '随机')
     logger.info("="*50)
     
     # 检查NFC读写器
     logger.info("\n[步骤1] 检查NFC读写器状态...")
-    nfc = NFCController()
+    nfc = NFCController(use_libnfc=args.libnfc)
     if not nfc.check_nfc_reader():
         logger.error("程序终止：NFC读写器未就绪")
+        nfc.close()
         return
     logger.info("✓ NFC读写器检查完成")
     
+    # 本次运行期间日期固定，只计算一次
+    date_str = args.date or datetime.datetime.now().strftime('%Y%m%d')
+    
     try:
+        # 预先生成所有标签的可变数据，所有标签复用同一个缓冲区
+        try:
+            mfd_batch = _iter_binary_mfd(args.count, date_str, args.suffix)
+        except Exception as e:
+            logger.error("生成MFD数据失败: %s", e)
+            return
+        
         # 开始处理标签
         for i in range(args.count):
             logger.info("\n" + "="*50)
-            logger.info(f"[标签 {i+1}/{args.count}] 开始处理")
+            logger.info("[标签 %d/%d] 开始处理", i+1, args.count)
             logger.info("="*50)
             
             # 等待新标签
@@ -382,11 +634,10 @@ def main():
             if not current_uid:
                 logger.error("未能获取到有效的标签UID，跳过当前标签")
                 continue
-            logger.info(f"✓ 标签已就位 (UID: {current_uid})")
+            logger.info("✓ 标签已就位 (UID: %s)", current_uid)
             
             # 生成临时文件名
             temp_read_file = nfc.temp_dir / generate_filename("temp_read", i+1)
-            temp_write_file = nfc.temp_dir / generate_filename("temp_write", i+1)
             final_file = Path(generate_filename(args.prefix, i+1))
             
             # 读取标签
@@ -398,37 +649,36 @@ def main():
             
             # 生成新的MFD数据
             logger.info("\n[步骤3] 生成新的标签数据...")
+            # 直接写入最终文件，创建后立即登记，程序中断时也能被清理
+            nfc.generated_files.append(final_file)
             try:
-                mfd_data = generate_binary_mfd(
-                    sector2_block3=generate_sector2_block3(args.date, args.suffix)
-                )
-                with open(temp_write_file, 'wb') as f:
-                    f.write(mfd_data)
+                save_mfd_file(next(mfd_batch), str(final_file))
                 logger.info("✓ 新标签数据生成完成")
             except Exception as e:
-                logger.error(f"生成MFD数据失败: {str(e)}")
+                logger.error("保存MFD数据失败: %s", e)
+                final_file.unlink(missing_ok=True)
+                nfc.generated_files.remove(final_file)
                 continue
             
             # 写入标签
             logger.info("\n[步骤4] 开始写入标签...")
-            if nfc.write_tag_from_file(str(temp_write_file), str(temp_read_file)):
-                # 写入成功，保存最终文件
-                os.rename(temp_write_file, final_file)
-                nfc.generated_files.append(final_file)
+            if nfc.write_tag_from_file(str(final_file), str(temp_read_file)):
+                # 写入成功，保留最终文件
                 nfc.processed_uids.append(current_uid)
-                logger.info(f"✓ 标签写入成功")
-                logger.info(f"✓ 数据已保存到: {final_file}")
+                logger.info("✓ 标签写入成功")
+                logger.info("✓ 数据已保存到: %s", final_file)
             else:
                 logger.error("标签写入失败，请检查标签状态")
+                final_file.unlink(missing_ok=True)
+                nfc.generated_files.remove(final_file)
                 continue
             
             # 清理临时文件
             try:
                 temp_read_file.unlink(missing_ok=True)
-                temp_write_file.unlink(missing_ok=True)
                 logger.info("✓ 临时文件清理完成")
             except Exception as e:
-                logger.warning(f"清理临时文件时发生错误: {str(e)}")
+                logger.warning("清理临时文件时发生错误: %s", e)
             
             if i < args.count - 1:
                 logger.info("\n" + "-"*50)
@@ -444,13 +694,14 @@ def main():
         # 清理生成的文件
         logger.info("\n[清理] 开始清理文件...")
         nfc.cleanup_generated_files(keep_files=args.keep_files)
+        nfc.close()
         # 清理临时目录
         try:
             if nfc.temp_dir.exists():
                 shutil.rmtree(nfc.temp_dir)
                 logger.info("✓ 临时目录清理完成")
         except Exception as e:
-            logger.warning(f"清理临时目录时发生错误: {str(e)}")
+            logger.warning("清理临时目录时发生错误: %s", e)
         
         logger.info("\n" + "="*50)
         logger.info("程序执行完成")